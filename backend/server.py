@@ -1,20 +1,27 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from cachetools import TTLCache
 import os
 import logging
 import asyncio
-import base64
+import hashlib
+import pybase64
 import io
 from pathlib import Path
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Literal
+from pydantic import AnyHttpUrl, BaseModel, Field, TypeAdapter, ValidationError, field_validator, model_validator
+from typing import Iterator, List, Optional, Literal, Set
 import uuid
+import secrets
+import shutil
+import tempfile
 from datetime import datetime, timezone
-from playwright.async_api import async_playwright
-import re
+from playwright.async_api import async_playwright, BrowserContext, CDPSession, Page
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+from urllib.parse import urlsplit
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -24,16 +31,45 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Number of independent Chromium processes used to serve screenshots in parallel
+BROWSER_POOL_SIZE = int(os.environ.get('BROWSER_POOL_SIZE', max(1, (os.cpu_count() or 2) // 2)))
+# Seconds a single raw CDP call or page script may take before its browser
+# is considered hung and relaunched
+CAPTURE_TIMEOUT = float(os.environ.get('SCREENSHOT_CAPTURE_TIMEOUT', 30))
+# Seconds a request waits for a free browser before giving up
+BROWSER_ACQUIRE_TIMEOUT = float(os.environ.get('BROWSER_ACQUIRE_TIMEOUT', 30))
+# Identical screenshot requests within the TTL are served from memory
+# The cache is bounded by the total size of the cached base64 images, and
+# images above the per-item limit are never cached
+SCREENSHOT_CACHE_BYTES = int(os.environ.get('SCREENSHOT_CACHE_BYTES', 128 * 1024 * 1024))
+SCREENSHOT_CACHE_MAX_ITEM_BYTES = int(os.environ.get('SCREENSHOT_CACHE_MAX_ITEM_BYTES', 8 * 1024 * 1024))
+SCREENSHOT_CACHE_TTL = int(os.environ.get('SCREENSHOT_CACHE_TTL', 30))
+# Origins visited by every pooled page at startup to prime DNS, TLS and connections
+WARMUP_URLS = [url.strip() for url in os.environ.get('WARMUP_URLS', 'https://www.google.com').split(',') if url.strip()]
+
 # Create the main app without a prefix
 app = FastAPI(title="URL Screenshot API", version="1.0.0")
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Token for admin-only endpoints; they are disabled when unset
+ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY')
+
+# Recently validated API keys, so hot keys skip the database lookup
+api_key_cache = TTLCache(maxsize=10_000, ttl=int(os.environ.get('API_KEY_CACHE_TTL', 60)))
+# Strong references to in-flight usage updates so they aren't garbage collected
+_usage_tasks = set()
+
+def _finish_usage_task(task: asyncio.Task):
+    _usage_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Failed to record API key usage: {task.exception()}")
+
 # Models
 class APIKey(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    key: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    key: str = Field(default_factory=lambda: secrets.token_urlsafe(24))
     name: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     is_active: bool = True
@@ -42,29 +78,45 @@ class APIKey(BaseModel):
 class APIKeyCreate(BaseModel):
     name: str
 
+# Longest wait for network idle or a selector; larger delays are clamped
+MAX_WAIT_MS = 10000
+
 class ScreenshotOptions(BaseModel):
     width: Optional[int] = Field(default=1920, ge=100, le=4000)
     height: Optional[int] = Field(default=1080, ge=100, le=4000)
     fullPage: Optional[bool] = False
-    delay: Optional[int] = Field(default=0, ge=0, le=30000)  # max 30 seconds
+    delay: Optional[int] = Field(default=0, ge=0, le=30000)  # Max wait for network idle, clamped to MAX_WAIT_MS
     format: Optional[Literal["png", "jpeg"]] = "png"
     quality: Optional[int] = Field(default=90, ge=1, le=100)  # Only for JPEG
+    block_resources: bool = True  # Skip fonts, media and analytics
+    response_format: Literal["binary", "base64"] = "base64"  # Raw image bytes or JSON data URI
+    max_full_page_height: int = Field(default=20000, ge=100, le=100000)  # Clip taller full pages
+    wait_for_selector: Optional[str] = None  # Capture once this element appears, delay is the timeout
+    
+    @model_validator(mode='after')
+    def default_full_page_to_jpeg(self):
+        # Full pages are large canvases where PNG encoding is slow, so use JPEG
+        # unless the caller picked a format
+        if self.fullPage and "format" not in self.model_fields_set:
+            self.format = "jpeg"
+            if "quality" not in self.model_fields_set:
+                self.quality = 85
+        return self
+
+# Built once so URL checks run in pydantic-core rather than Python
+_HTTP_URL = TypeAdapter(AnyHttpUrl)
 
 class ScreenshotRequest(BaseModel):
     url: str
     options: Optional[ScreenshotOptions] = Field(default_factory=ScreenshotOptions)
     
-    @validator('url')
+    @field_validator('url', mode='before')
+    @classmethod
     def validate_url(cls, v):
-        url_pattern = re.compile(
-            r'^https?://'  # http:// or https://
-            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
-            r'localhost|'  # localhost...
-            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-            r'(?::\d+)?'  # optional port
-            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-        
-        if not url_pattern.match(v):
+        # Validate only; the caller's URL string is kept unnormalized
+        try:
+            _HTTP_URL.validate_python(v)
+        except ValidationError:
             raise ValueError('Invalid URL format')
         return v
 
@@ -85,55 +137,328 @@ async def verify_api_key(authorization: Optional[str] = Header(None)):
     
     api_key = authorization.replace("Bearer ", "")
     
-    # Check if API key exists and is active
-    key_doc = await db.api_keys.find_one({"key": api_key, "is_active": True})
+    # Known good key: only the usage count needs to reach the database. It is
+    # started right away so, like a cache miss, every request is counted even
+    # if the handler later fails
+    cached_key = api_key_cache.get(api_key)
+    if cached_key is not None:
+        task = asyncio.create_task(db.api_keys.update_one(
+            {"key": api_key},
+            {"$inc": {"usage_count": 1}}
+        ))
+        _usage_tasks.add(task)
+        task.add_done_callback(_finish_usage_task)
+        return cached_key
+    
+    # Check that the API key exists and is active, counting the usage atomically
+    key_doc = await db.api_keys.find_one_and_update(
+        {"key": api_key, "is_active": True},
+        {"$inc": {"usage_count": 1}},
+        return_document=ReturnDocument.BEFORE
+    )
     if not key_doc:
         raise HTTPException(status_code=401, detail="Invalid or inactive API key")
     
-    # Update usage count
-    await db.api_keys.update_one(
-        {"key": api_key},
-        {"$inc": {"usage_count": 1}}
-    )
+    key = APIKey(**key_doc)
+    api_key_cache[api_key] = key
+    return key
+
+async def verify_admin_key(authorization: Optional[str] = Header(None)):
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
     
-    return APIKey(**key_doc)
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid admin authorization")
+    
+    if not secrets.compare_digest(authorization.replace("Bearer ", ""), ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
 
 # Screenshot service
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Extra headers to appear more like a real browser
+EXTRA_HTTP_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+# Stealth settings to avoid detection
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined,
+    });
+    
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5],
+    });
+    
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['en-US', 'en'],
+    });
+    
+    window.chrome = {
+        runtime: {},
+    };
+    
+    Object.defineProperty(navigator, 'permissions', {
+        get: () => ({
+            query: async () => ({ state: 'granted' }),
+        }),
+    });
+"""
+
+# Requests skipped unless the caller asks for full fidelity. Blocking goes
+# through CDP URL patterns because Playwright routing disables the HTTP cache
+BLOCKED_EXTENSIONS = ("woff", "woff2", "ttf", "otf", "eot", "mp4", "webm", "ogg", "mp3", "wav", "m4a")
+BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "connect.facebook.net",
+    "hotjar.com",
+    "segment.io",
+)
+BLOCKED_URL_PATTERNS = (
+    [pattern for ext in BLOCKED_EXTENSIONS for pattern in (f"*.{ext}", f"*.{ext}?*")]
+    + [pattern for host in BLOCKED_HOSTS for pattern in (f"*://{host}/*", f"*://*.{host}/*")]
+)
+
+# Fragments of the Playwright errors raised for malformed selectors
+SELECTOR_ERROR_MARKERS = ("is not a valid selector", "Unexpected token", "Unknown engine")
+
+# Viewport pooled pages start with, matching the ScreenshotOptions defaults
+DEFAULT_VIEWPORT = {"width": 1920, "height": 1080}
+
+# Per-origin storage wiped between callers; the HTTP cache is deliberately kept
+CLEARED_STORAGE_TYPES = "local_storage,indexeddb,websql,service_workers,cache_storage,file_systems"
+
+def _origin(url: str) -> Optional[str]:
+    """Return scheme://host[:port] for web URLs, None for about:blank and the like"""
+    parsed = urlsplit(url)
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        return None
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+class _BrowserSlot:
+    """One Chromium process with its own profile and a single pooled page"""
+    
+    def __init__(self, index: int):
+        self.index = index
+        self.context: Optional[BrowserContext] = None
+        self.page: Optional[Page] = None
+        self.cdp: Optional[CDPSession] = None
+        self.blocking = False
+        # Origins visited since the last reset, whose storage must be cleared
+        self.origins: Set[str] = set()
+        # Set when a reset failed, so the next hand-out wipes storage first
+        self.needs_wipe = False
+    
+    def record_navigation(self, url: str):
+        origin = _origin(url)
+        if origin:
+            self.origins.add(origin)
+
 class ScreenshotService:
-    def __init__(self):
+    def __init__(self, pool_size: int = BROWSER_POOL_SIZE):
         self.playwright = None
-        self.browser = None
+        self.pool_size = pool_size
+        self._slots: List[_BrowserSlot] = []
+        self._profile_root: Optional[str] = None
+        self._pool: Optional[asyncio.Queue] = None
+        self._cache = TTLCache(maxsize=SCREENSHOT_CACHE_BYTES, ttl=SCREENSHOT_CACHE_TTL, getsizeof=len)
+        self._init_lock = asyncio.Lock()
+    
+    async def _launch_browser(self, index: int) -> BrowserContext:
+        # A persistent profile per pool slot keeps Chromium's HTTP cache warm
+        # across requests; separate directories avoid profile lock contention
+        return await self.playwright.chromium.launch_persistent_context(
+            user_data_dir=os.path.join(self._profile_root, f'slot-{index}'),
+            headless=True,
+            user_agent=USER_AGENT,
+            extra_http_headers=EXTRA_HTTP_HEADERS,
+            viewport=DEFAULT_VIEWPORT,
+            args=[
+                '--no-sandbox',
+                '--disable-setuid-sandbox',
+                '--disable-dev-shm-usage',
+                '--disable-accelerated-2d-canvas',
+                '--no-first-run',
+                '--no-zygote',
+                '--disable-gpu',
+                '--disable-blink-features=AutomationControlled',
+                '--disable-features=VizDisplayCompositor',
+                '--disable-features=TranslateUI',
+                '--disable-ipc-flooding-protection',
+                '--excludeSwitches=enable-automation',
+                '--useAutomationExtension=false',
+                '--disable-extensions-except=',
+                '--disable-extensions',
+                '--disable-plugins-discovery',
+                '--disable-default-apps'
+            ]
+        )
+    
+    async def _open_page(self, slot: _BrowserSlot):
+        # The stealth script sticks to the page across reuses
+        page = await slot.context.new_page()
+        await page.add_init_script(STEALTH_SCRIPT)
+        page.on("framenavigated", lambda frame: slot.record_navigation(frame.url))
+        slot.cdp = await slot.context.new_cdp_session(page)
+        await self._bounded(slot, slot.cdp.send("Network.enable"))
+        slot.blocking = False
+        slot.page = page
+    
+    async def _start_slot(self, slot: _BrowserSlot):
+        slot.context = await self._launch_browser(slot.index)
+        await self._open_page(slot)
+    
+    async def _ensure_slot(self, slot: _BrowserSlot):
+        """Relaunch whatever part of a slot was torn down after a failure.
+        
+        A recovered slot reuses its on-disk profile, so the previous caller's
+        cookies and storage are wiped before the slot is used again.
+        """
+        if slot.context is None:
+            await self._start_slot(slot)
+        elif slot.page is None:
+            await self._open_page(slot)
+        if slot.needs_wipe:
+            await self._wipe_storage(slot)
+    
+    async def _stop_slot(self, slot: _BrowserSlot):
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+        # Visited origins are kept: the relaunched browser reuses the same
+        # profile, so _ensure_slot wipes their storage before the next render
+        slot.needs_wipe = True
+        slot.context = None
+        slot.page = None
+        slot.cdp = None
+    
+    async def _bounded(self, slot: _BrowserSlot, awaitable, timeout: float = CAPTURE_TIMEOUT):
+        """Await a call that has no timeout of its own, tearing the slot down if it hangs.
+        
+        Raw CDP sends and page.evaluate never time out, so a hung renderer
+        would otherwise hold its slot forever; the next request relaunches it.
+        """
+        try:
+            return await asyncio.wait_for(awaitable, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Browser slot {slot.index} hung for {timeout:g} seconds, relaunching on next use")
+            await self._stop_slot(slot)
+            raise HTTPException(status_code=504, detail=f"Screenshot capture timed out after {timeout:g} seconds")
+    
+    async def _acquire_slot(self) -> _BrowserSlot:
+        try:
+            return await asyncio.wait_for(self._pool.get(), timeout=BROWSER_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=503,
+                detail=f"All browsers busy for {BROWSER_ACQUIRE_TIMEOUT:g} seconds, try again later"
+            )
     
     async def initialize(self):
-        if not self.playwright:
+        async with self._init_lock:
+            if self.playwright:
+                return
             self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(
-                headless=True,
-                args=[
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-accelerated-2d-canvas',
-                    '--no-first-run',
-                    '--no-zygote',
-                    '--disable-gpu',
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-features=VizDisplayCompositor',
-                    '--disable-web-security',
-                    '--disable-features=TranslateUI',
-                    '--disable-ipc-flooding-protection',
-                    '--excludeSwitches=enable-automation',
-                    '--useAutomationExtension=false',
-                    '--disable-extensions-except=',
-                    '--disable-extensions',
-                    '--disable-plugins-discovery',
-                    '--disable-default-apps'
-                ]
-            )
+            # Profiles live under a per-process root so several server workers
+            # never launch Chromium against the same (locked) profile
+            self._profile_root = tempfile.mkdtemp(prefix=f'chrome-profiles-{os.getpid()}-')
+            # Launch several browsers so concurrent screenshots don't queue up
+            # behind a single Chromium process. Each has exactly one page, so
+            # context-wide state is never shared between concurrent requests
+            self._slots = [_BrowserSlot(i) for i in range(self.pool_size)]
+            await asyncio.gather(*[self._start_slot(slot) for slot in self._slots])
+            # The slot queue is the concurrency gate: a render holds a slot for
+            # its whole duration, so excess requests wait here instead of
+            # thrashing Chromium
+            self._pool = asyncio.Queue()
+            for slot in self._slots:
+                self._pool.put_nowait(slot)
     
-    async def take_screenshot(self, request: ScreenshotRequest) -> str:
+    async def warm_up(self, urls: List[str]):
+        """Visit each URL on every pooled page so first requests find warm connections"""
         await self.initialize()
+        slots = [self._pool.get_nowait() for _ in range(self._pool.qsize())]
+        
+        async def visit(slot: _BrowserSlot):
+            for url in urls:
+                try:
+                    await slot.page.goto(url, wait_until="domcontentloaded", timeout=10000)
+                except Exception as e:
+                    logger.warning(f"Warm-up visit to {url} failed: {e}")
+            await self._release_slot(slot)
+        
+        await asyncio.gather(*[visit(slot) for slot in slots])
+    
+    async def _reset_slot(self, slot: _BrowserSlot):
+        """Drop everything the last caller left behind except the HTTP cache"""
+        page = slot.page
+        # sessionStorage belongs to the tab, so clear it before leaving the page
+        await self._bounded(slot, page.evaluate("() => { try { sessionStorage.clear() } catch (e) {} }"))
+        await page.goto("about:blank")
+        await self._wipe_storage(slot)
+    
+    async def _wipe_storage(self, slot: _BrowserSlot):
+        """Clear cookies and the storage of every origin the slot visited"""
+        await slot.context.clear_cookies()
+        for origin in slot.origins:
+            await self._bounded(slot, slot.cdp.send("Storage.clearDataForOrigin", {
+                "origin": origin,
+                "storageTypes": CLEARED_STORAGE_TYPES
+            }))
+        slot.origins.clear()
+        slot.needs_wipe = False
+    
+    async def _release_slot(self, slot: _BrowserSlot):
+        """Reset a slot and hand it back to the pool, replacing its page if it broke.
         
+        The slot always goes back, even when its browser is gone; the next
+        request relaunches it, so the pool never shrinks.
+        """
+        try:
+            if slot.page is not None:
+                try:
+                    await self._reset_slot(slot)
+                except Exception as e:
+                    logger.warning(f"Replacing broken pooled page: {e}")
+                    slot.needs_wipe = True
+                    try:
+                        await slot.page.close()
+                    except Exception:
+                        pass
+                    slot.page = None
+                    try:
+                        await self._ensure_slot(slot)
+                    except Exception as e:
+                        logger.error(f"Browser slot {slot.index} is dead, relaunching on next use: {e}")
+                        await self._stop_slot(slot)
+        finally:
+            self._pool.put_nowait(slot)
+    
+    async def take_screenshot(self, request: ScreenshotRequest) -> str:
+        """Capture the page and return the image as base64, as Chromium sends it"""
+        # Everything except the response encoding affects the rendered image
+        options = request.options.model_dump(exclude={"response_format"})
+        cache_key = hashlib.blake2b((request.url + str(options)).encode(), digest_size=16).digest()
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        await self.initialize()
+        base64_image = await self._render(request)
+        # TTLCache rejects items bigger than its whole budget, which also lets
+        # SCREENSHOT_CACHE_BYTES=0 disable caching
+        if len(base64_image) <= min(SCREENSHOT_CACHE_MAX_ITEM_BYTES, self._cache.maxsize):
+            self._cache[cache_key] = base64_image
+        return base64_image
+    
+    async def _render(self, request: ScreenshotRequest) -> str:
         # Handle known problematic shortened URLs
         url_to_use = request.url
         if "myntr.it" in request.url:
@@ -146,105 +471,126 @@ class ScreenshotService:
             except Exception as e:
                 logger.warning(f"Could not resolve shortened URL, using original: {e}")
         
-        # Create page with better settings for real websites
-        page = await self.browser.new_page(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        )
-        
-        # Add stealth settings to avoid detection
-        await page.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined,
-            });
-            
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5],
-            });
-            
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['en-US', 'en'],
-            });
+        slot = await self._acquire_slot()
+        try:
+            await self._ensure_slot(slot)
+            page = slot.page
             
-            window.chrome = {
-                runtime: {},
-            };
+            # Blocked URLs stick to the page's CDP session, so only send changes
+            block_resources = request.options.block_resources
+            if block_resources != slot.blocking:
+                await self._bounded(slot, slot.cdp.send("Network.setBlockedURLs", {
+                    "urls": BLOCKED_URL_PATTERNS if block_resources else []
+                }))
+                slot.blocking = block_resources
             
-            Object.defineProperty(navigator, 'permissions', {
-                get: () => ({
-                    query: async () => ({ state: 'granted' }),
-                }),
-            });
-        """)
-        
-        try:
-            # Set viewport
-            await page.set_viewport_size({
+            # Set viewport, skipping the round trip when the page already has it
+            viewport = {
                 "width": request.options.width,
                 "height": request.options.height
-            })
-            
-            # Add extra headers to appear more like a real browser
-            await page.set_extra_http_headers({
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8",
-                "Accept-Language": "en-US,en;q=0.9",
-                "Accept-Encoding": "gzip, deflate, br",
-                "Upgrade-Insecure-Requests": "1",
-            })
+            }
+            if page.viewport_size != viewport:
+                await page.set_viewport_size(viewport)
             
             # Navigate to URL with better error handling and longer timeout
             await page.goto(
                 url_to_use, 
-                wait_until="domcontentloaded",  # Less strict than networkidle
+                wait_until="load",
                 timeout=60000  # Increased timeout to 60 seconds
             )
             
+            if request.options.wait_for_selector:
+                # Wait for the element the caller needs rather than a fixed delay
+                selector_timeout = min(request.options.delay or MAX_WAIT_MS, MAX_WAIT_MS)
+                try:
+                    await page.wait_for_selector(request.options.wait_for_selector, timeout=selector_timeout)
+                except PlaywrightTimeoutError:
+                    raise HTTPException(
+                        status_code=504,
+                        detail=f"Page did not show selector {request.options.wait_for_selector!r} within {selector_timeout}ms"
+                    )
+                except PlaywrightError as e:
+                    if not any(marker in str(e) for marker in SELECTOR_ERROR_MARKERS):
+                        raise
+                    raise HTTPException(
+                        status_code=422,
+                        detail=f"Invalid wait_for_selector {request.options.wait_for_selector!r}"
+                    )
+            else:
+                # Wait for the network to settle, bounded by the requested delay
+                # (3 seconds if none) and clamped to MAX_WAIT_MS
+                settle_timeout = min(request.options.delay or 3000, MAX_WAIT_MS)
+                try:
+                    await page.wait_for_load_state("networkidle", timeout=settle_timeout)
+                except PlaywrightTimeoutError:
+                    logger.info(f"Network still busy after {settle_timeout}ms, capturing anyway: {request.url}")
+            
             # Add realistic behavior - random mouse movement
             await page.mouse.move(100, 100)
-            await asyncio.sleep(0.5)
+            await page.wait_for_timeout(500)
             await page.mouse.move(200, 200)
             
-            # Apply delay if specified (minimum 2 seconds for stealth)
-            delay_time = max(request.options.delay, 2000) if request.options.delay > 0 else 2000
-            await asyncio.sleep(delay_time / 1000)
-            
             # Scroll a bit to simulate real user behavior
-            await page.evaluate("window.scrollTo(0, 200)")
-            await asyncio.sleep(0.5)
-            await page.evaluate("window.scrollTo(0, 0)")
+            await self._bounded(slot, page.evaluate("window.scrollTo(0, 200)"))
+            await page.wait_for_timeout(500)
+            await self._bounded(slot, page.evaluate("window.scrollTo(0, 0)"))
             
             # Check if page loaded successfully (look for common error indicators)
             page_content = await page.content()
             if "oops" in page_content.lower() and "something went wrong" in page_content.lower():
                 logger.warning(f"Page shows error content for URL: {request.url}")
                 # Try waiting a bit more and refreshing
-                await asyncio.sleep(3)
+                await page.wait_for_timeout(3000)
                 await page.reload(wait_until="domcontentloaded")
-                await asyncio.sleep(2)
+                await page.wait_for_timeout(2000)
             
-            # Take screenshot
+            # Take screenshot over CDP directly; its base64 payload is passed
+            # through as-is rather than decoded by Playwright and re-encoded
+            cdp = slot.cdp
             screenshot_options = {
-                "full_page": request.options.fullPage,
-                "type": request.options.format
+                "format": request.options.format,
+                "captureBeyondViewport": bool(request.options.fullPage)
             }
             
             # Add quality for JPEG
             if request.options.format == "jpeg":
                 screenshot_options["quality"] = request.options.quality
             
-            screenshot_bytes = await page.screenshot(**screenshot_options)
+            # Full pages are clipped to the content size, capping very tall
+            # pages instead of rasterizing all of them
+            if request.options.fullPage:
+                metrics = await self._bounded(slot, cdp.send("Page.getLayoutMetrics"))
+                content_size = metrics["cssContentSize"]
+                screenshot_options["clip"] = {
+                    "x": 0,
+                    "y": 0,
+                    "width": content_size["width"],
+                    "height": min(content_size["height"], request.options.max_full_page_height),
+                    "scale": 1
+                }
             
-            # Convert to base64
-            base64_image = base64.b64encode(screenshot_bytes).decode()
-            return f"data:image/{request.options.format};base64,{base64_image}"
+            result = await self._bounded(slot, cdp.send("Page.captureScreenshot", screenshot_options))
+            return result["data"]
             
         finally:
-            await page.close()
+            await self._release_slot(slot)
     
     async def cleanup(self):
-        if self.browser:
-            await self.browser.close()
+        for slot in self._slots:
+            if slot.context:
+                await slot.context.close()
+        self._slots = []
         if self.playwright:
             await self.playwright.stop()
+        if self._profile_root:
+            shutil.rmtree(self._profile_root, ignore_errors=True)
+            self._profile_root = None
+
+def iter_bytes(data: bytes, chunk_size: int = 65536) -> Iterator[bytes]:
+    """Yield data in fixed-size chunks for streaming responses"""
+    buffer = io.BytesIO(data)
+    while chunk := buffer.read(chunk_size):
+        yield chunk
 
 # Initialize screenshot service
 screenshot_service = ScreenshotService()
@@ -254,7 +600,7 @@ screenshot_service = ScreenshotService()
 async def create_api_key(request: APIKeyCreate):
     """Create a new API key"""
     api_key = APIKey(name=request.name)
-    await db.api_keys.insert_one(api_key.dict())
+    await db.api_keys.insert_one(api_key.model_dump())
     return api_key
 
 @api_router.get("/api-keys", response_model=List[APIKey])
@@ -263,30 +609,72 @@ async def list_api_keys():
     keys = await db.api_keys.find().to_list(100)
     return [APIKey(**key) for key in keys]
 
+@api_router.delete("/api-keys/{key_id}", response_model=APIKey, dependencies=[Depends(verify_admin_key)])
+async def revoke_api_key(key_id: str):
+    """Deactivate an API key (admin only)"""
+    key_doc = await db.api_keys.find_one_and_update(
+        {"id": key_id},
+        {"$set": {"is_active": False}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not key_doc:
+        raise HTTPException(status_code=404, detail="API key not found")
+    
+    # Drop this worker's cached validation; other workers keep accepting
+    # the key until their cache entry expires (API_KEY_CACHE_TTL)
+    api_key_cache.pop(key_doc["key"], None)
+    return APIKey(**key_doc)
+
+async def _take_screenshot(request: ScreenshotRequest) -> str:
+    """Run a capture, turning unexpected failures into a 500"""
+    try:
+        return await screenshot_service.take_screenshot(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Screenshot error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Screenshot capture failed: {str(e)}")
+
 @api_router.post("/v1/screenshot", response_model=ScreenshotResponse)
 async def capture_screenshot(
     request: ScreenshotRequest,
     api_key: APIKey = Depends(verify_api_key)
 ):
     """Capture screenshot of a webpage"""
-    try:
-        # Take screenshot
-        base64_image = await screenshot_service.take_screenshot(request)
-        
-        # Create response
-        response = ScreenshotResponse(
-            status="success",
-            image=base64_image,
-            format=request.options.format,
-            timestamp=datetime.now(timezone.utc),
-            url=request.url
-        )
-        
-        return response
-        
-    except Exception as e:
-        logger.error(f"Screenshot error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Screenshot capture failed: {str(e)}")
+    # Binary responses are served by the raw image endpoint
+    if request.options.response_format == "binary":
+        return await capture_screenshot_binary(request, api_key)
+    
+    # Take screenshot
+    base64_image = await _take_screenshot(request)
+    
+    # Create response
+    response = ScreenshotResponse(
+        status="success",
+        image=f"data:image/{request.options.format};base64,{base64_image}",
+        format=request.options.format,
+        timestamp=datetime.now(timezone.utc),
+        url=request.url
+    )
+    
+    return response
+
+@api_router.post("/v1/screenshot.bin")
+async def capture_screenshot_binary(
+    request: ScreenshotRequest,
+    api_key: APIKey = Depends(verify_api_key)
+):
+    """Capture screenshot of a webpage and stream back the raw image"""
+    base64_image = await _take_screenshot(request)
+    # Decoded in a worker thread so large images don't block the event loop
+    screenshot_bytes = await asyncio.to_thread(pybase64.b64decode, base64_image)
+    
+    # The image is already in memory, so chunking only keeps each write small;
+    # it is sent as-is since images are already compressed
+    return StreamingResponse(
+        iter_bytes(screenshot_bytes),
+        media_type=f"image/{request.options.format}"
+    )
 
 @api_router.get("/")
 async def root():
@@ -312,8 +700,13 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize Playwright on startup"""
+    """Initialize Playwright and database indexes on startup"""
+    # Index API keys so authentication is an index seek rather than a collection scan
+    await db.api_keys.create_index("key", unique=True)
+    await db.api_keys.create_index([("key", 1), ("is_active", 1)])
     await screenshot_service.initialize()
+    if WARMUP_URLS:
+        await screenshot_service.warm_up(WARMUP_URLS)
     logger.info("Screenshot service initialized")
 
 @app.on_event("shutdown")
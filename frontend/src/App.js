@@ -19,7 +19,7 @@ function App() {
     width: 1920,
     height: 1080,
     fullPage: false,
-    delay: 5000, // Increased default delay for complex sites
+    delay: 5000, // Max wait for the page's network to go idle
     format: 'png',
     quality: 90
   });
@@ -166,7 +166,7 @@ function App() {
               className="w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-blue-500"
             />
             <p className="mt-1 text-sm text-gray-500">
-              💡 For e-commerce sites (Amazon, Myntra, Flipkart), use higher delay (8000+ ms) for better results
+              💡 Capture happens once the page's network goes idle; for e-commerce sites (Amazon, Myntra, Flipkart), raise the max wait (up to 10000 ms) for better results
             </p>
           </div>
 
@@ -210,14 +210,16 @@ function App() {
             </div>
             <div>
               <label className="block text-sm font-medium text-gray-700 mb-1">
-                Delay (ms)
+                Max wait (ms)
               </label>
               <input
                 type="number"
+                min={0}
+                max={10000}
                 value={options.delay}
                 onChange={(e) => setOptions({...options, delay: parseInt(e.target.value)})}
                 className="w-full px-2 py-1 border border-gray-300 rounded text-sm"
-                title="Wait time before capturing screenshot. Use 5000+ for e-commerce sites"
+                title="Longest wait for the page's network to go idle before capturing (up to 10000). Use 5000+ for e-commerce sites"
               />
             </div>
             <div>
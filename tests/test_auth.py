@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import revoke_api_key, verify_admin_key, verify_api_key
+
+
+class FakeAPIKeys:
+    """Stand-in for the motor api_keys collection"""
+
+    def __init__(self, doc=None, fail_updates=False):
+        self.doc = doc
+        self.fail_updates = fail_updates
+        self.lookups = 0
+        self.increments = 0
+
+    async def find_one_and_update(self, filter, update, return_document=None):
+        self.lookups += 1
+        if self.doc is None or filter.get("key", self.doc["key"]) != self.doc["key"]:
+            return None
+        if "$set" in update:
+            self.doc = {**self.doc, **update["$set"]}
+        return self.doc
+
+    async def update_one(self, filter, update):
+        if self.fail_updates:
+            raise RuntimeError("connection reset")
+        self.increments += 1
+
+
+class FakeDB:
+    def __init__(self, api_keys):
+        self.api_keys = api_keys
+
+
+KEY_DOC = {"id": "key-id", "key": "secret-key", "name": "Test", "is_active": True, "usage_count": 0}
+
+
+@pytest.fixture
+def api_keys(monkeypatch):
+    collection = FakeAPIKeys(dict(KEY_DOC))
+    monkeypatch.setattr(server, "db", FakeDB(collection))
+    server.api_key_cache.clear()
+    yield collection
+    server.api_key_cache.clear()
+
+
+def test_cache_hit_skips_lookup_but_counts_usage(api_keys):
+    async def run():
+        await verify_api_key(authorization="Bearer secret-key")
+        key = await verify_api_key(authorization="Bearer secret-key")
+        # Let the fire-and-forget increment run
+        await asyncio.sleep(0)
+        return key
+
+    key = asyncio.run(run())
+    assert key.key == "secret-key"
+    assert api_keys.lookups == 1
+    assert api_keys.increments == 1
+
+
+def test_failed_usage_update_is_logged(api_keys, caplog):
+    api_keys.fail_updates = True
+
+    async def run():
+        await verify_api_key(authorization="Bearer secret-key")
+        await verify_api_key(authorization="Bearer secret-key")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert "Failed to record API key usage: connection reset" in caplog.text
+    assert not server._usage_tasks
+
+
+def test_unknown_key_is_rejected_and_not_cached(api_keys):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(verify_api_key(authorization="Bearer wrong-key"))
+    assert exc.value.status_code == 401
+    assert "wrong-key" not in server.api_key_cache
+
+
+def test_revoke_evicts_cached_key(api_keys, monkeypatch):
+    async def run():
+        await verify_api_key(authorization="Bearer secret-key")
+        assert "secret-key" in server.api_key_cache
+        return await revoke_api_key("key-id")
+
+    revoked = asyncio.run(run())
+    assert revoked.is_active is False
+    assert "secret-key" not in server.api_key_cache
+
+
+def test_admin_endpoints_disabled_without_admin_key(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_API_KEY", None)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(verify_admin_key(authorization="Bearer anything"))
+    assert exc.value.status_code == 403
+
+
+def test_admin_key_must_match(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_API_KEY", "admin-secret")
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(verify_admin_key(authorization="Bearer wrong"))
+    assert exc.value.status_code == 401
+    asyncio.run(verify_admin_key(authorization="Bearer admin-secret"))
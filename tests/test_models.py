@@ -0,0 +1,72 @@
+import pytest
+from pydantic import ValidationError
+
+from server import ScreenshotOptions, ScreenshotRequest
+
+
+class TestFullPageDefaults:
+    def test_full_page_defaults_to_jpeg_85(self):
+        options = ScreenshotOptions(fullPage=True)
+        assert options.format == "jpeg"
+        assert options.quality == 85
+
+    def test_full_page_keeps_explicit_format(self):
+        options = ScreenshotOptions(fullPage=True, format="png")
+        assert options.format == "png"
+        assert options.quality == 90
+
+    def test_full_page_keeps_explicit_quality(self):
+        options = ScreenshotOptions(fullPage=True, quality=60)
+        assert options.format == "jpeg"
+        assert options.quality == 60
+
+    def test_viewport_capture_stays_png(self):
+        options = ScreenshotOptions()
+        assert options.format == "png"
+        assert options.quality == 90
+
+    def test_max_full_page_height_rejects_null(self):
+        with pytest.raises(ValidationError):
+            ScreenshotOptions(max_full_page_height=None)
+
+    def test_delay_keeps_thirty_second_bound(self):
+        assert ScreenshotOptions(delay=15000).delay == 15000
+        assert ScreenshotOptions(delay=30000).delay == 30000
+        with pytest.raises(ValidationError):
+            ScreenshotOptions(delay=30001)
+
+
+class TestOptionTypes:
+    def test_block_resources_rejects_null(self):
+        assert ScreenshotOptions().block_resources is True
+        with pytest.raises(ValidationError):
+            ScreenshotOptions(block_resources=None)
+
+    def test_response_format_rejects_null(self):
+        assert ScreenshotOptions().response_format == "base64"
+        with pytest.raises(ValidationError):
+            ScreenshotOptions(response_format=None)
+
+
+class TestURLValidation:
+    @pytest.mark.parametrize("url", [
+        "https://example.com",
+        "http://example.com/path?q=1#frag",
+        "http://localhost:8000",
+        "http://127.0.0.1",
+        "http://foo",
+        "HTTP://EXAMPLE.COM",
+    ])
+    def test_accepts_http_urls(self, url):
+        assert ScreenshotRequest(url=url).url == url
+
+    @pytest.mark.parametrize("url", [
+        "example.com",
+        "ftp://example.com",
+        "javascript:alert(1)",
+        "http://",
+        "",
+    ])
+    def test_rejects_other_urls(self, url):
+        with pytest.raises(ValidationError, match="Invalid URL format"):
+            ScreenshotRequest(url=url)
@@ -0,0 +1,274 @@
+import asyncio
+import re
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import (
+    BLOCKED_URL_PATTERNS,
+    ScreenshotRequest,
+    ScreenshotService,
+    _BrowserSlot,
+    _origin,
+    iter_bytes,
+)
+
+
+def _is_blocked(url):
+    # CDP URL patterns only support "*" as a wildcard
+    return any(
+        re.fullmatch(re.escape(pattern).replace(r"\*", ".*"), url)
+        for pattern in BLOCKED_URL_PATTERNS
+    )
+
+
+class TestBlockedURLPatterns:
+    @pytest.mark.parametrize("url", [
+        "https://example.com/fonts/inter.woff2",
+        "https://example.com/fonts/inter.woff2?v=3",
+        "https://cdn.example.com/intro.mp4",
+        "https://www.google-analytics.com/analytics.js",
+        "https://google-analytics.com/collect",
+        "https://stats.g.doubleclick.net/r/collect",
+    ])
+    def test_blocks_fonts_media_and_analytics(self, url):
+        assert _is_blocked(url)
+
+    @pytest.mark.parametrize("url", [
+        "https://example.com/",
+        "https://example.com/app.js",
+        "https://example.com/logo.png",
+        "https://notdoubleclick.net/",
+        "https://example.com/woff2-guide",
+    ])
+    def test_allows_regular_resources(self, url):
+        assert not _is_blocked(url)
+
+
+class TestOrigins:
+    def test_origin_of_web_urls(self):
+        assert _origin("https://example.com/a/b?c=1") == "https://example.com"
+        assert _origin("http://localhost:8000/") == "http://localhost:8000"
+
+    def test_origin_ignores_non_web_urls(self):
+        assert _origin("about:blank") is None
+        assert _origin("data:text/html,hi") is None
+
+    def test_slot_records_visited_origins(self):
+        slot = _BrowserSlot(0)
+        slot.record_navigation("https://example.com/page")
+        slot.record_navigation("https://example.com/other")
+        slot.record_navigation("about:blank")
+        assert slot.origins == {"https://example.com"}
+
+
+class TestIterBytes:
+    def test_splits_into_fixed_chunks(self):
+        data = bytes(range(256)) * 10
+        chunks = list(iter_bytes(data, chunk_size=1000))
+        assert [len(chunk) for chunk in chunks] == [1000, 1000, 560]
+        assert b"".join(chunks) == data
+
+    def test_empty_input_yields_nothing(self):
+        assert list(iter_bytes(b"")) == []
+
+
+class TestScreenshotCache:
+    def _service(self, monkeypatch, image="aW1hZ2U="):
+        service = ScreenshotService(pool_size=1)
+        calls = []
+
+        async def initialize():
+            pass
+
+        async def render(request):
+            calls.append(request)
+            return image
+
+        monkeypatch.setattr(service, "initialize", initialize)
+        monkeypatch.setattr(service, "_render", render)
+        return service, calls
+
+    def test_response_format_shares_cache_entry(self, monkeypatch):
+        service, calls = self._service(monkeypatch)
+
+        async def run():
+            base64_request = ScreenshotRequest(url="https://example.com", options={"response_format": "base64"})
+            binary_request = ScreenshotRequest(url="https://example.com", options={"response_format": "binary"})
+            assert await service.take_screenshot(base64_request) == "aW1hZ2U="
+            assert await service.take_screenshot(binary_request) == "aW1hZ2U="
+
+        asyncio.run(run())
+        assert len(calls) == 1
+
+    def test_render_options_change_cache_key(self, monkeypatch):
+        service, calls = self._service(monkeypatch)
+
+        async def run():
+            await service.take_screenshot(ScreenshotRequest(url="https://example.com", options={"width": 800}))
+            await service.take_screenshot(ScreenshotRequest(url="https://example.com", options={"width": 1024}))
+
+        asyncio.run(run())
+        assert len(calls) == 2
+
+    def test_images_over_cache_budget_are_not_cached(self, monkeypatch):
+        monkeypatch.setattr(server, "SCREENSHOT_CACHE_BYTES", 4)
+        service, calls = self._service(monkeypatch)
+
+        async def run():
+            request = ScreenshotRequest(url="https://example.com")
+            assert await service.take_screenshot(request) == "aW1hZ2U="
+            assert await service.take_screenshot(request) == "aW1hZ2U="
+
+        asyncio.run(run())
+        assert len(calls) == 2
+
+    def test_zero_budget_disables_cache(self, monkeypatch):
+        monkeypatch.setattr(server, "SCREENSHOT_CACHE_BYTES", 0)
+        service, calls = self._service(monkeypatch)
+
+        async def run():
+            request = ScreenshotRequest(url="https://example.com")
+            assert await service.take_screenshot(request) == "aW1hZ2U="
+
+        asyncio.run(run())
+        assert len(calls) == 1
+
+    def test_oversized_images_are_not_cached(self, monkeypatch):
+        monkeypatch.setattr(server, "SCREENSHOT_CACHE_MAX_ITEM_BYTES", 4)
+        service, calls = self._service(monkeypatch)
+
+        async def run():
+            request = ScreenshotRequest(url="https://example.com")
+            await service.take_screenshot(request)
+            await service.take_screenshot(request)
+
+        asyncio.run(run())
+        assert len(calls) == 2
+
+
+class FakeCDPSession:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, method, params=None):
+        self.sent.append((method, params))
+        return {}
+
+
+class FakePage:
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.closed = False
+
+    async def add_init_script(self, script):
+        pass
+
+    def on(self, event, callback):
+        pass
+
+    async def evaluate(self, expression):
+        if self.broken:
+            raise RuntimeError("Target crashed")
+
+    async def goto(self, url, **kwargs):
+        if self.broken:
+            raise RuntimeError("Target crashed")
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self):
+        self.cookies_cleared = 0
+        self.cdp_sessions = []
+
+    async def new_page(self):
+        return FakePage()
+
+    async def new_cdp_session(self, page):
+        session = FakeCDPSession()
+        self.cdp_sessions.append(session)
+        return session
+
+    async def clear_cookies(self):
+        self.cookies_cleared += 1
+
+    async def close(self):
+        pass
+
+
+def _cleared_origins(session):
+    return {
+        params["origin"]
+        for method, params in session.sent
+        if method == "Storage.clearDataForOrigin"
+    }
+
+
+class TestSlotRecovery:
+    def test_replaced_page_is_wiped_before_returning_to_pool(self):
+        service = ScreenshotService(pool_size=1)
+        context = FakeContext()
+        slot = _BrowserSlot(0)
+        slot.context = context
+        slot.page = FakePage(broken=True)
+        slot.cdp = FakeCDPSession()
+        slot.record_navigation("https://example.com/account")
+
+        async def run():
+            service._pool = asyncio.Queue()
+            await service._release_slot(slot)
+            return service._pool.get_nowait()
+
+        assert asyncio.run(run()) is slot
+        assert context.cookies_cleared == 1
+        assert _cleared_origins(context.cdp_sessions[-1]) == {"https://example.com"}
+        assert slot.origins == set()
+        assert not slot.needs_wipe
+
+    def test_relaunched_slot_is_wiped_before_use(self, monkeypatch):
+        service = ScreenshotService(pool_size=1)
+        context = FakeContext()
+        slot = _BrowserSlot(0)
+        slot.record_navigation("https://example.com/account")
+        slot.needs_wipe = True
+
+        async def launch_browser(index):
+            return context
+
+        monkeypatch.setattr(service, "_launch_browser", launch_browser)
+        asyncio.run(service._ensure_slot(slot))
+
+        assert slot.context is context
+        assert context.cookies_cleared == 1
+        assert _cleared_origins(context.cdp_sessions[-1]) == {"https://example.com"}
+        assert not slot.needs_wipe
+
+
+class TestHungCalls:
+    def test_hung_call_stops_slot_and_times_out(self):
+        service = ScreenshotService(pool_size=1)
+        slot = _BrowserSlot(0)
+        slot.context = FakeContext()
+        slot.page = FakePage()
+        slot.cdp = FakeCDPSession()
+
+        async def run():
+            await service._bounded(slot, asyncio.sleep(10), timeout=0.01)
+
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(run())
+        assert exc.value.status_code == 504
+        assert slot.context is None and slot.page is None
+        assert slot.needs_wipe
+
+    def test_bounded_returns_result(self):
+        service = ScreenshotService(pool_size=1)
+
+        async def value():
+            return {"data": "aW1hZ2U="}
+
+        assert asyncio.run(service._bounded(_BrowserSlot(0), value())) == {"data": "aW1hZ2U="}